@@ -0,0 +1,52 @@
+"""
+JSON file helpers backed by orjson.
+"""
+
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Dict, Union
+
+import orjson
+
+# Files at least this large are parsed straight from a memory map
+MMAP_THRESHOLD = 10 * 1024 * 1024
+
+
+def load_json(path: Union[str, Path]) -> Any:
+    """Load a JSON file."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
+        return orjson.loads(f.read())
+
+
+def dump_json(data: Any, path: Union[str, Path], indent: bool = True):
+    """
+    Write data to a JSON file (UTF-8, 2-space indent by default).
+    
+    The file is written and fsynced to a temporary sibling, then moved into
+    place, so a crash leaves either the old or the new file, never a partial one.
+    """
+    option = orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(data, option=option))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def loads_line(line: bytes) -> Dict:
+    """Parse one JSONL record."""
+    return orjson.loads(line)
+
+
+def dumps_line(record: Dict) -> bytes:
+    """Serialize one JSONL record, including the trailing newline."""
+    return orjson.dumps(record, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
@@ -2,22 +2,30 @@
 Delta detection for articles - identifies new, updated, and unchanged articles.
 """
 
-import json
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from index_store import IndexStore
 
 
 class DeltaDetector:
-    def __init__(self, index_file: str = "data/index.json"):
+    def __init__(self, index_file: str = "data/index.json", index: Optional[Dict[str, Dict]] = None):
+        # An index that is already loaded can be passed in to avoid rereading it
         self.index_file = Path(index_file)
-        self.index = self._load_index()
+        self.index = index if index is not None else self._load_index()
+        self._last_diff = None
+        
+        # (slug, hash) of every indexed article: one set probe identifies an
+        # unchanged article without a per-slug metadata lookup
+        self._fingerprints = {
+            (slug, metadata.get("hash", ""))
+            for slug, metadata in self.index.items()
+            if metadata
+        }
     
     def _load_index(self) -> Dict:
-        """Load article index."""
-        if self.index_file.exists():
-            with open(self.index_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return {}
+        """Load article index (snapshot plus change log)."""
+        return IndexStore(self.index_file).load()
     
     def detect_changes(self, scraped_articles: Dict[str, Dict]) -> Tuple[List[str], List[str], List[str]]:
         """
@@ -26,37 +34,40 @@ class DeltaDetector:
         Returns:
             (new_slugs, updated_slugs, unchanged_slugs)
         """
+        return self._diff(scraped_articles)[0]
+    
+    def get_articles_to_upload(self, scraped_articles: Dict[str, Dict]) -> Dict[str, Dict]:
+        """Get articles that need to be uploaded (new or updated)."""
+        return self._diff(scraped_articles)[1]
+    
+    def _diff(self, scraped_articles: Dict[str, Dict]) -> Tuple[Tuple[List[str], List[str], List[str]], Dict[str, Dict]]:
+        """
+        Categorize scraped articles against the index in a single pass.
+        
+        The result is cached for the last scraped_articles dict seen, so
+        detect_changes followed by get_articles_to_upload diffs only once.
+        """
+        if self._last_diff is not None and self._last_diff[0] is scraped_articles:
+            return self._last_diff[1]
+        
+        index = self.index
+        fingerprints = self._fingerprints
         new_slugs = []
         updated_slugs = []
         unchanged_slugs = []
         
         for slug, metadata in scraped_articles.items():
-            old_metadata = self.index.get(slug)
-            
-            if not old_metadata:
+            if (slug, metadata.get("hash", "")) in fingerprints:
+                # Unchanged
+                unchanged_slugs.append(slug)
+            elif index.get(slug):
+                # Updated article (hash changed)
+                updated_slugs.append(slug)
+            else:
                 # New article
                 new_slugs.append(slug)
-            else:
-                # Check if hash changed
-                old_hash = old_metadata.get("hash", "")
-                new_hash = metadata.get("hash", "")
-                
-                if old_hash != new_hash:
-                    # Updated article
-                    updated_slugs.append(slug)
-                else:
-                    # Unchanged
-                    unchanged_slugs.append(slug)
         
-        return new_slugs, updated_slugs, unchanged_slugs
-    
-    def get_articles_to_upload(self, scraped_articles: Dict[str, Dict]) -> Dict[str, Dict]:
-        """Get articles that need to be uploaded (new or updated)."""
-        new_slugs, updated_slugs, _ = self.detect_changes(scraped_articles)
-        
-        to_upload = {}
-        for slug in new_slugs + updated_slugs:
-            to_upload[slug] = scraped_articles[slug]
-        
-        return to_upload
-
+        to_upload = {slug: scraped_articles[slug] for slug in new_slugs + updated_slugs}
+        result = ((new_slugs, updated_slugs, unchanged_slugs), to_upload)
+        self._last_diff = (scraped_articles, result)
+        return result
@@ -0,0 +1,119 @@
+"""
+Article index storage: a JSON snapshot plus an append-only JSONL change log.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from _json_io import dump_json, dumps_line, load_json, loads_line
+
+# Compact the log into the snapshot once it exceeds this fraction of the index
+COMPACT_RATIO = 0.2
+
+
+class IndexStore:
+    def __init__(self, index_file: str = "data/index.json"):
+        self.index_file = Path(index_file)
+        self.log_file = self.index_file.with_name(f"{self.index_file.stem}.log.jsonl")
+        # Present only while the index covers every article on the site
+        self.complete_file = self.index_file.with_name(f"{self.index_file.stem}.complete")
+        self.index = {}
+        self._snapshot_size = 0
+        self._log_lines = 0
+    
+    def load(self) -> Dict[str, Dict]:
+        """Load the snapshot and replay the change log on top of it."""
+        index = {}
+        if self.index_file.exists():
+            index = load_json(self.index_file)
+        self._snapshot_size = len(index)
+        
+        self._log_lines = 0
+        if self.log_file.exists():
+            with open(self.log_file, "rb") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = loads_line(line)
+                    except ValueError:
+                        # A crash mid-append can leave a truncated last line
+                        print(f"Warning: skipping unreadable line in {self.log_file}")
+                        continue
+                    if "delete" in record:
+                        index.pop(record["delete"], None)
+                    else:
+                        slug = record.pop("slug")
+                        index[slug] = record
+                    self._log_lines += 1
+        
+        self.index = index
+        return index
+    
+    def update(self, articles: Dict[str, Dict]):
+        """Record new or changed article metadata."""
+        records = [
+            {"slug": slug, **metadata}
+            for slug, metadata in articles.items()
+            if self.index.get(slug) != metadata
+        ]
+        self.index.update(articles)
+        self._append(records)
+    
+    def delete(self, slugs: Iterable[str]):
+        """Remove articles from the index."""
+        records = [{"delete": slug} for slug in slugs if slug in self.index]
+        for record in records:
+            del self.index[record["delete"]]
+        self._append(records)
+    
+    def is_complete(self) -> bool:
+        """Check whether the last run recorded every listed article."""
+        return self.complete_file.exists()
+    
+    def set_complete(self, complete: bool):
+        """
+        Record whether the index now covers every listed article.
+        
+        Clear the marker before updating the index and set it only after,
+        so a failed update can only leave the index marked incomplete.
+        """
+        if complete:
+            self.complete_file.parent.mkdir(parents=True, exist_ok=True)
+            self.complete_file.touch()
+        elif self.complete_file.exists():
+            self.complete_file.unlink()
+    
+    def compact(self):
+        """Rewrite the snapshot from the current index and clear the log."""
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        # Compact form: the snapshot is machine-read; see `make pretty-index`
+        dump_json(self.index, self.index_file, indent=False)
+        
+        # Replaying a stale log onto the new snapshot is harmless, so a crash
+        # between these two steps loses nothing
+        if self.log_file.exists():
+            self.log_file.unlink()
+        self._snapshot_size = len(self.index)
+        self._log_lines = 0
+    
+    def _append(self, records: List[Dict]):
+        """Append change records to the log, fsyncing once per batch."""
+        if not records:
+            return
+        
+        self.log_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.log_file, "a+b") as f:
+            # Start on a fresh line if a previous append was cut short
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.write(b"".join(dumps_line(record) for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_lines += len(records)
+        
+        if self._log_lines > COMPACT_RATIO * self._snapshot_size:
+            self.compact()
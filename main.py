@@ -3,17 +3,17 @@ Main entrypoint for KB sync agent.
 Orchestrates: scrape → detect delta → upload only new/updated articles.
 """
 
-import json
 import os
 import sys
+import traceback
 from datetime import datetime
 from pathlib import Path
 
 from dotenv import load_dotenv
 
+from _json_io import dump_json
 from delta import DeltaDetector
 from scraper import ArticleScraper
-from uploader import ArticleUploader
 
 # Load environment variables
 load_dotenv()
@@ -52,7 +52,8 @@ def main():
         
         # Step 2: Detect changes
         print("\n[2/3] Detecting changes...")
-        detector = DeltaDetector()
+        # Reuse the index the scraper already loaded instead of re-reading it
+        detector = DeltaDetector(index=scraper.index)
         new_slugs, updated_slugs, unchanged_slugs = detector.detect_changes(scraped_articles)
         counts["added"] = len(new_slugs)
         counts["updated"] = len(updated_slugs)
@@ -68,13 +69,19 @@ def main():
         
         if articles_to_upload:
             print(f"\n[3/3] Uploading {len(articles_to_upload)} articles to vector store...")
-            uploader = ArticleUploader(api_key=api_key)
+            # Imported here: the OpenAI SDK dominates startup and runs with
+            # nothing to upload never need it
+            from uploader import ArticleUploader
+            uploader = ArticleUploader(
+                api_key=api_key,
+                chunk_cache_dir=str(scraper.data_dir / "chunk_cache")
+            )
             articles_dir = Path("data/articles")
             
             chunk_counts = uploader.upload_articles(articles_to_upload, articles_dir)
             counts["chunks_uploaded"] = sum(chunk_counts.values())
             
-            print(f"\nUpload summary:")
+            print(f"\nUpload summary (chunks queued for vector store indexing):")
             for slug, chunk_count in chunk_counts.items():
                 print(f"  {slug}: {chunk_count} chunks")
         else:
@@ -82,20 +89,14 @@ def main():
         
         # Update index with all scraped articles (after delta detection and upload)
         # This ensures next run can properly detect changes
-        index_file = Path("data/index.json")
-        if index_file.exists():
-            with open(index_file, "r", encoding="utf-8") as f:
-                index = json.load(f)
-        else:
-            index = {}
-        
-        # Update index with all scraped articles
-        index.update(scraped_articles)
-        
-        # Save updated index
-        index_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(index_file, "w", encoding="utf-8") as f:
-            json.dump(index, f, indent=2, ensure_ascii=False)
+        # Only entries that changed are appended to the index change log.
+        # The complete marker is cleared before and set only after the update,
+        # so a failed update can never leave a stale marker behind
+        if not scraper.listing_complete:
+            scraper.index_store.set_complete(False)
+        scraper.index_store.update(scraped_articles)
+        if scraper.listing_complete:
+            scraper.index_store.set_complete(True)
         
         # Generate artifacts
         artifacts_dir = Path("artifacts")
@@ -115,8 +116,7 @@ def main():
         }
         
         artifact_file = artifacts_dir / "last_run.json"
-        with open(artifact_file, "w", encoding="utf-8") as f:
-            json.dump(run_artifact, f, indent=2)
+        dump_json(run_artifact, artifact_file)
         
         print("\n" + "=" * 60)
         print("Summary:")
@@ -124,7 +124,7 @@ def main():
         print(f"  Articles added: {counts['added']}")
         print(f"  Articles updated: {counts['updated']}")
         print(f"  Articles skipped: {counts['skipped']}")
-        print(f"  Chunks uploaded: {counts['chunks_uploaded']}")
+        print(f"  Chunks uploaded (queued for indexing): {counts['chunks_uploaded']}")
         print(f"  Artifact saved: {artifact_file}")
         if uploader and uploader.vector_store_id:
             print(f"  Vector Store ID: {uploader.vector_store_id}")
@@ -137,7 +137,6 @@ def main():
         return 1
     except Exception as e:
         print(f"\n\nERROR: {e}")
-        import traceback
         traceback.print_exc()
         errors.append(str(e))
         
@@ -150,8 +149,7 @@ def main():
             "errors": errors
         }
         artifact_file = artifacts_dir / "last_run.json"
-        with open(artifact_file, "w", encoding="utf-8") as f:
-            json.dump(run_artifact, f, indent=2)
+        dump_json(run_artifact, artifact_file)
         
         return 1
 
@@ -4,17 +4,24 @@ This script can be used to test the assistant or generate output for verificatio
 """
 
 import os
-import json
+import time
 import warnings
 from pathlib import Path
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from _json_io import load_json
+
 # Suppress deprecation warning for Assistants API (still the current API)
 warnings.filterwarnings("ignore", category=DeprecationWarning, message=".*Assistants API.*")
 
 load_dotenv()
 
+# Run polling: start fast, back off geometrically up to the old 1s interval
+POLL_INITIAL_DELAY = 0.1
+POLL_BACKOFF = 1.3
+POLL_MAX_DELAY = 1.0
+
 
 def check_assistant(assistant_id: str = None, vector_store_id: str = None):
     """
@@ -84,9 +91,10 @@ def check_assistant(assistant_id: str = None, vector_store_id: str = None):
     print("Waiting for response...")
     
     # Poll for completion
-    import time
+    delay = POLL_INITIAL_DELAY
     while run.status in ["queued", "in_progress"]:
-        time.sleep(1)
+        time.sleep(delay)
+        delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
         run = client.beta.threads.runs.retrieve(
             thread_id=thread.id,
             run_id=run.id
@@ -134,9 +142,8 @@ if __name__ == "__main__":
     vector_store_id = None
     
     if artifact_file.exists():
-        with open(artifact_file, "r") as f:
-            artifact = json.load(f)
-            vector_store_id = artifact.get("vector_store_id")
+        artifact = load_json(artifact_file)
+        vector_store_id = artifact.get("vector_store_id")
     
     # Allow override via command line
     assistant_id = sys.argv[1] if len(sys.argv) > 1 else None
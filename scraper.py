@@ -3,24 +3,65 @@ Scraper for OptiSigns support articles.
 Attempts Zendesk Help Center API first, falls back to web scraping.
 """
 
-import json
 import os
 import re
+import threading
 import time
 import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 
-import requests
-from bs4 import BeautifulSoup
-from markdownify import markdownify as md
+import httpx
+import lxml.html
+from blake3 import blake3
+from lxml import etree
 
-# Rate limiting: 1 request per second
+from index_store import IndexStore
+
+# Rate limiting: 1 request per second (aggregate across all worker threads)
 RATE_LIMIT_DELAY = 1.0
+# Concurrent article fetches; requests stay paced by RATE_LIMIT_DELAY
+MAX_WORKERS = 8
+# HTTP connection pool size (kept-alive connections)
+HTTP_POOL_SIZE = 32
 BASE_URL = "https://support.optisigns.com"
 API_BASE = f"{BASE_URL}/api/v2/help_center"
+# Content hash for delta detection; index entries without "hash_algo" are SHA256
+HASH_ALGO = "blake3"
+LEGACY_HASH_ALGO = "sha256"
+# Bump whenever HTML cleaning or markdown conversion output changes, so
+# unchanged source HTML is converted again
+CONVERTER_VERSION = "1"
+# Markdown normalization for consistent hashing
+_MULTI_NEWLINE_RE = re.compile(r"\n{3,}")
+_CR_TRANS = str.maketrans({"\r": "\n"})
+# Leading XML declaration on an article body
+_XML_DECL_RE = re.compile(r"^\s*<\?xml[^>]*\?>")
+# Navigation, sidebar and ad elements stripped before markdown conversion
+_JUNK_XPATH = etree.XPath(
+    "//nav | //header | //footer | //aside | //script | //style"
+    " | //*[re:test(@class, '(nav|menu|sidebar|ad|cookie)', 'i')]",
+    namespaces={"re": "http://exslt.org/regular-expressions"},
+)
+# Articles per page for cursor-paginated listing (Zendesk maximum)
+PAGE_SIZE = 100
+
+
+@lru_cache(maxsize=None)
+def _markdown_converter():
+    """
+    Get the shared markdown converter, importing markdownify on first use.
+    
+    The converter keeps its per-tag conversion cache warm across articles
+    (its only mutable state, so it is safe to share between worker threads).
+    """
+    from markdownify import MarkdownConverter
+    # Parse with lxml rather than bs4's default pure-Python html.parser
+    return MarkdownConverter(heading_style="ATX", bullets="-", bs4_options="lxml")
 
 
 class ArticleScraper:
@@ -41,13 +82,23 @@ class ArticleScraper:
         self.article_limit = article_limit
         
         # Load existing index
+        self.index_store = IndexStore(self.index_file)
         self.index = self._load_index()
         
-        # Session for requests
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        })
+        # Shared HTTP/2 client; connections are kept alive across worker threads.
+        # httpx negotiates gzip/deflate (and br/zstd when available) itself.
+        self.session = httpx.Client(
+            http2=True,
+            headers={
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+            },
+            timeout=10.0,
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_SIZE,
+                max_keepalive_connections=HTTP_POOL_SIZE,
+            ),
+            follow_redirects=True,
+        )
         
         # Set up Zendesk authentication if credentials are provided
         zendesk_email = os.getenv("ZENDESK_EMAIL")
@@ -60,83 +111,100 @@ class ArticleScraper:
         else:
             print("No Zendesk credentials provided, using public API")
         
-        self.last_request_time = 0
+        # Token bucket: next time slot a request may be issued in
+        self._rate_lock = threading.Lock()
+        self._next_slot = 0.0
+        
+        # Set when the API listing stopped early at an unchanged article
+        self.api_listing_truncated = False
+        # Set when the API listing reached its end (or stopped early) without errors
+        self.api_listing_complete = False
+        # Set when this run scraped every article, so the index can be marked complete
+        self.listing_complete = False
         
     def _load_index(self) -> Dict:
-        """Load article index from JSON file."""
-        if self.index_file.exists():
-            with open(self.index_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return {}
+        """Load article index (snapshot plus change log)."""
+        return self.index_store.load()
     
     def _save_index(self):
-        """Save article index to JSON file."""
-        with open(self.index_file, "w", encoding="utf-8") as f:
-            json.dump(self.index, f, indent=2, ensure_ascii=False)
+        """Record changed index entries in the index change log."""
+        self.index_store.update(self.index)
     
     def _rate_limit(self):
-        """Enforce rate limiting."""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < RATE_LIMIT_DELAY:
-            time.sleep(RATE_LIMIT_DELAY - elapsed)
-        self.last_request_time = time.time()
+        """Enforce rate limiting (thread-safe)."""
+        with self._rate_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + RATE_LIMIT_DELAY
+        
+        # Sleep outside the lock so other threads can reserve later slots
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
     
     def _normalize_markdown(self, text: str) -> str:
         """Normalize markdown for consistent hashing."""
+        # Normalize line endings first so runs of CRLF blank lines collapse too
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").translate(_CR_TRANS)
         # Remove extra whitespace
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        # Normalize line endings
-        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        text = _MULTI_NEWLINE_RE.sub("\n\n", text)
         # Strip leading/trailing whitespace
         return text.strip()
     
-    def _compute_hash(self, content: str) -> str:
-        """Compute SHA256 hash of normalized content."""
-        normalized = self._normalize_markdown(content)
-        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    def _compute_hash(self, content: str, algo: str = HASH_ALGO) -> str:
+        """Compute hash of normalized content (BLAKE3 unless a legacy algo is given)."""
+        normalized = self._normalize_markdown(content).encode("utf-8")
+        if algo == LEGACY_HASH_ALGO:
+            return hashlib.sha256(normalized).hexdigest()
+        return blake3(normalized).hexdigest()
+    
+    def _compute_raw_hash(self, title: str, body_html: str) -> str:
+        """Compute hash of the source title and HTML, before markdown conversion."""
+        return blake3(f"{CONVERTER_VERSION}\0{title}\0{body_html}".encode("utf-8")).hexdigest()
+    
+    def _clean_tree(self, html: str) -> lxml.html.HtmlElement:
+        """Parse HTML and remove navigation, sidebars, ads."""
+        # lxml refuses str input that carries an encoding declaration; the
+        # text is already decoded, so the declaration means nothing here
+        html = _XML_DECL_RE.sub("", html, count=1)
+        try:
+            tree = lxml.html.document_fromstring(html)
+        except etree.ParserError:
+            # Nothing to parse: blank, or only comments / processing instructions
+            tree = lxml.html.document_fromstring("<html><body></body></html>")
+        
+        # Remove junk tags and elements with common ad/nav classes in one pass;
+        # drop_tree keeps the text that follows each removed element
+        for elem in _JUNK_XPATH(tree):
+            if elem.getparent() is not None:
+                elem.drop_tree()
+        
+        return tree
     
     def _clean_html(self, html: str) -> str:
         """Clean HTML by removing navigation, sidebars, ads."""
-        soup = BeautifulSoup(html, "lxml")
-        
-        # Remove common navigation/sidebar elements
-        for selector in [
-            "nav", "header", "footer", "aside",
-            ".nav", ".navbar", ".sidebar", ".menu",
-            ".ad", ".advertisement", ".ads",
-            "script", "style"
-        ]:
-            for elem in soup.select(selector):
-                elem.decompose()
-        
-        # Remove elements with common ad/nav classes
-        for elem in soup.find_all(class_=re.compile(r"(nav|menu|sidebar|ad|cookie)", re.I)):
-            elem.decompose()
-        
-        return str(soup)
+        return lxml.html.tostring(self._clean_tree(html), encoding="unicode")
     
     def _html_to_markdown(self, html: str, base_url: str = BASE_URL) -> str:
         """Convert HTML to clean Markdown."""
-        cleaned = self._clean_html(html)
-        soup = BeautifulSoup(cleaned, "lxml")
-        
-        # Convert relative links to absolute
-        for link in soup.find_all("a", href=True):
-            href = link["href"]
-            if href.startswith("/"):
-                link["href"] = urljoin(base_url, href)
+        tree = self._clean_tree(html)
         
-        # Convert images
-        for img in soup.find_all("img", src=True):
-            src = img["src"]
-            if src.startswith("/"):
-                img["src"] = urljoin(base_url, src)
+        # Convert relative links and image sources to absolute
+        tree.rewrite_links(
+            lambda url: urljoin(base_url, url) if url.startswith("/") else url
+        )
         
         # Convert to markdown
-        md_text = md(str(soup), heading_style="ATX", bullets="-")
+        md_text = _markdown_converter().convert(lxml.html.tostring(tree, encoding="unicode"))
         
         return self._normalize_markdown(md_text)
     
+    @staticmethod
+    def _api_slug(article: Dict) -> str:
+        """Get the index slug for a Zendesk API article."""
+        return article.get("slug", f"article-{article.get('id')}")
+    
     def _fetch_article_api(self, article_id: int) -> Optional[Dict]:
         """Fetch article from Zendesk API."""
         url = f"{API_BASE}/articles/{article_id}.json"
@@ -154,6 +222,8 @@ class ArticleScraper:
     
     def _fetch_article_web(self, article_url: str) -> Optional[Dict]:
         """Scrape article from web page."""
+        from bs4 import BeautifulSoup
+        
         self._rate_limit()
         
         try:
@@ -186,40 +256,68 @@ class ArticleScraper:
         return None
     
     def _get_article_list_api(self) -> List[Dict]:
-        """Get article list from Zendesk API."""
+        """
+        Get article list from Zendesk API, most recently updated first.
+        
+        Uses cursor pagination. When the index is known to hold every article,
+        stops at the first article whose updated_at matches it: everything
+        listed after it is older, so it is unchanged since the last run.
+        """
         articles = []
-        page = 1
-        per_page = 100
+        self.api_listing_truncated = False
+        self.api_listing_complete = False
+        # A partial index (limited or failed runs) may be missing older articles
+        can_stop_early = self.index_store.is_complete() and not self.article_limit
+        url = f"{API_BASE}/articles.json"
+        params = {
+            "page[size]": PAGE_SIZE,
+            "sort_by": "updated_at",
+            "sort_order": "desc",
+        }
         
-        while True:
-            url = f"{API_BASE}/articles.json?per_page={per_page}&page={page}"
+        while url:
             self._rate_limit()
             
             try:
-                response = self.session.get(url, timeout=10)
+                response = self.session.get(url, params=params, timeout=10)
                 if response.status_code != 200:
                     break
                 
                 data = response.json()
-                page_articles = data.get("articles", [])
-                if not page_articles:
-                    break
-                
-                articles.extend(page_articles)
-                
-                # Check if there are more pages
-                if len(page_articles) < per_page:
-                    break
+                for article in data.get("articles", []):
+                    updated_at = article.get("updated_at")
+                    old_metadata = self.index.get(self._api_slug(article), {})
+                    if can_stop_early and updated_at and old_metadata.get("last_modified") == updated_at:
+                        self.api_listing_truncated = True
+                        self.api_listing_complete = True
+                        return articles
+                    articles.append(article)
                 
-                page += 1
+                # The next link already carries the cursor and query parameters
+                has_more = data.get("meta", {}).get("has_more")
+                url = data.get("links", {}).get("next") if has_more else None
+                params = None
+                if not url:
+                    self.api_listing_complete = True
             except Exception as e:
-                print(f"API list fetch failed at page {page}: {e}")
+                print(f"API list fetch failed at {url}: {e}")
                 break
         
         return articles
     
+    def _get_unlisted_articles(self, listed: List[Dict]) -> Dict[str, Dict]:
+        """Get index metadata for API articles that a truncated listing skipped."""
+        listed_slugs = {self._api_slug(article) for article in listed}
+        return {
+            slug: metadata
+            for slug, metadata in self.index.items()
+            if metadata.get("last_modified") and slug not in listed_slugs
+        }
+    
     def _get_article_list_web(self) -> List[str]:
         """Get article URLs by scraping sitemap or category pages."""
+        from bs4 import BeautifulSoup
+        
         article_urls = []
         
         # Try to find sitemap
@@ -267,6 +365,97 @@ class ArticleScraper:
         
         return article_urls[:50]  # Limit to 50 for initial scrape
     
+    def _scrape_article(self, item, use_api: bool) -> Optional[Tuple[str, Dict]]:
+        """
+        Fetch a single article, convert it to markdown and save it.
+        
+        Articles unchanged since the last run reuse their index metadata
+        without conversion. Runs inside a worker thread.
+        
+        Returns:
+            (slug, metadata) or None if the article could not be fetched
+        """
+        if use_api:
+            # Skip the download entirely if Zendesk reports no update since last run
+            slug = self._api_slug(item)
+            old_metadata = self.index.get(slug, {})
+            if (
+                item.get("updated_at")
+                and old_metadata.get("last_modified") == item.get("updated_at")
+                and (self.articles_dir / f"{slug}.md").exists()
+            ):
+                return slug, dict(old_metadata)
+            
+            # The list endpoint returns full articles; fetch only if the body is missing
+            article_id = item.get("id")
+            article_data = item if "body" in item else self._fetch_article_api(article_id)
+            if not article_data:
+                return None
+            
+            title = article_data.get("title", "Untitled")
+            body_html = article_data.get("body", "")
+            slug = self._api_slug(article_data)
+            source_url = article_data.get("html_url", f"{BASE_URL}/articles/{article_id}")
+            last_modified = article_data.get("updated_at")
+        else:
+            article_url = item if isinstance(item, str) else item.get("url", "")
+            article_data = self._fetch_article_web(article_url)
+            if not article_data:
+                return None
+            
+            title = article_data.get("title", "Untitled")
+            body_html = article_data.get("body", "")
+            slug = article_data.get("slug", "unknown")
+            source_url = article_data.get("html_url", article_url)
+            last_modified = None
+        
+        # Skip conversion and rewrite if the source HTML is unchanged
+        raw_hash = self._compute_raw_hash(title, body_html)
+        md_file = self.articles_dir / f"{slug}.md"
+        old_metadata = self.index.get(slug, {})
+        if old_metadata.get("raw_hash") == raw_hash and md_file.exists():
+            return slug, {
+                **old_metadata,
+                "source_url": source_url,
+                "last_modified": last_modified,
+            }
+        
+        # Convert to markdown
+        markdown_content = self._html_to_markdown(body_html, BASE_URL)
+        
+        # Add title as H1 if not present
+        if not markdown_content.startswith("#"):
+            markdown_content = f"# {title}\n\n{markdown_content}"
+        
+        # Compute hash
+        content_hash = self._compute_hash(markdown_content)
+        hash_algo = HASH_ALGO
+        
+        # Entries hashed with the legacy algorithm keep their hash while the
+        # content is unchanged, so migrating does not re-upload everything
+        old_algo = old_metadata.get("hash_algo", LEGACY_HASH_ALGO)
+        if old_metadata and old_algo != HASH_ALGO:
+            if self._compute_hash(markdown_content, old_algo) == old_metadata.get("hash"):
+                content_hash, hash_algo = old_metadata["hash"], old_algo
+        
+        # Save markdown file (on this worker thread, overlapping other fetches);
+        # skip the write when only the source HTML changed, not the markdown
+        if content_hash != old_metadata.get("hash") or not md_file.exists():
+            md_file.write_bytes(markdown_content.encode("utf-8"))
+        
+        # Store metadata
+        metadata = {
+            "source_url": source_url,
+            "last_modified": last_modified,
+            "hash": content_hash,
+            "hash_algo": hash_algo,
+            "raw_hash": raw_hash,
+            "scrape_time": datetime.utcnow().isoformat() + "Z",
+            "title": title
+        }
+        
+        return slug, metadata
+    
     def scrape_articles(self) -> Dict[str, Dict]:
         """Scrape all articles and return metadata."""
         print("Fetching article list...")
@@ -274,11 +463,19 @@ class ArticleScraper:
         # Try API first
         api_articles = self._get_article_list_api()
         
-        if api_articles and len(api_articles) >= 30:
+        # Articles past the early-exit point are carried over from the index
+        unchanged = {}
+        if self.api_listing_truncated:
+            unchanged = self._get_unlisted_articles(api_articles)
+        
+        if len(api_articles) + len(unchanged) >= 30:
             print(f"Found {len(api_articles)} articles via API")
+            if unchanged:
+                print(f"  {len(unchanged)} older articles unchanged since last run")
             articles_to_process = api_articles
             use_api = True
         else:
+            unchanged = {}
             print("API not available or insufficient articles, falling back to web scraping")
             article_urls = self._get_article_list_web()
             print(f"Found {len(article_urls)} article URLs via web scraping")
@@ -286,61 +483,36 @@ class ArticleScraper:
             use_api = False
         
         # Apply article limit if set
-        if self.article_limit and len(articles_to_process) > self.article_limit:
+        limited = bool(self.article_limit) and len(articles_to_process) > self.article_limit
+        if limited:
             print(f"Limiting to {self.article_limit} articles (found {len(articles_to_process)})")
             articles_to_process = articles_to_process[:self.article_limit]
         
-        scraped = {}
-        
-        for i, item in enumerate(articles_to_process, 1):
-            if use_api:
-                article_id = item.get("id")
-                article_data = self._fetch_article_api(article_id)
-                if not article_data:
-                    continue
-                
-                title = article_data.get("title", "Untitled")
-                body_html = article_data.get("body", "")
-                slug = article_data.get("slug", f"article-{article_id}")
-                source_url = article_data.get("html_url", f"{BASE_URL}/articles/{article_id}")
-                last_modified = article_data.get("updated_at")
-            else:
-                article_url = item if isinstance(item, str) else item.get("url", "")
-                article_data = self._fetch_article_web(article_url)
-                if not article_data:
-                    continue
-                
-                title = article_data.get("title", "Untitled")
-                body_html = article_data.get("body", "")
-                slug = article_data.get("slug", "unknown")
-                source_url = article_data.get("html_url", article_url)
-                last_modified = None
-            
-            # Convert to markdown
-            markdown_content = self._html_to_markdown(body_html, BASE_URL)
-            
-            # Add title as H1 if not present
-            if not markdown_content.startswith("#"):
-                markdown_content = f"# {title}\n\n{markdown_content}"
-            
-            # Compute hash
-            content_hash = self._compute_hash(markdown_content)
-            
-            # Save markdown file
-            md_file = self.articles_dir / f"{slug}.md"
-            with open(md_file, "w", encoding="utf-8") as f:
-                f.write(markdown_content)
-            
-            # Store metadata
-            scraped[slug] = {
-                "source_url": source_url,
-                "last_modified": last_modified,
-                "hash": content_hash,
-                "scrape_time": datetime.utcnow().isoformat() + "Z",
-                "title": title
+        # Fetch, convert and save articles concurrently
+        results = [None] * len(articles_to_process)
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(self._scrape_article, item, use_api): position
+                for position, item in enumerate(articles_to_process)
             }
             
-            print(f"[{i}/{len(articles_to_process)}] Scraped: {slug} - {title[:50]}")
+            for i, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                if not result:
+                    continue
+                
+                results[futures[future]] = result
+                slug, metadata = result
+                print(f"[{i}/{len(articles_to_process)}] Scraped: {slug} - {metadata['title'][:50]}")
+        
+        # The index covers every article only if a full API listing was scraped
+        # without failures; main.py records this once the index is saved
+        self.listing_complete = use_api and self.api_listing_complete and not limited and all(results)
+        
+        # Keep the original listing order regardless of completion order
+        scraped = dict(result for result in results if result)
+        for slug, metadata in unchanged.items():
+            scraped.setdefault(slug, metadata)
         
         # Note: Index is NOT updated here - it's updated in main.py after delta detection
         # This allows delta detection to compare against the old index
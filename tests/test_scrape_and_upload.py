@@ -10,8 +10,9 @@ from pathlib import Path
 import pytest
 from bs4 import BeautifulSoup
 
+from index_store import IndexStore
 from scraper import ArticleScraper
-from uploader import ArticleUploader
+from uploader import OVERLAP_TOKENS, ArticleUploader
 
 
 @pytest.fixture
@@ -64,7 +65,19 @@ def test_html_to_markdown(sample_html):
     assert "youtube.com" in markdown.lower()
 
 
-def test_hash_computation():
+def test_html_to_markdown_empty_bodies():
+    """Test that bodies with no content convert to empty markdown instead of raising."""
+    scraper = ArticleScraper(data_dir="temp_test")
+    for html in ["", "   ", "<!-- draft -->", "<?xml-stylesheet href='a.css'?>"]:
+        assert scraper._html_to_markdown(html) == ""
+        assert "<body>" in scraper._clean_html(html)
+    
+    # An encoding declaration on the already-decoded body is ignored
+    html = "<?xml version='1.0' encoding='utf-8'?><p>Body text</p>"
+    assert scraper._html_to_markdown(html).strip() == "Body text"
+
+
+def test_hash_computation(monkeypatch):
     """Test hash computation for delta detection."""
     scraper = ArticleScraper(data_dir="temp_test")
     
@@ -82,8 +95,169 @@ def test_hash_computation():
     # Different content should produce different hash
     assert hash1 != hash3
     
-    # Hash should be 64 characters (SHA256 hex)
+    # Hash should be 64 characters (BLAKE3 hex)
     assert len(hash1) == 64
+    
+    # A converter change invalidates raw hashes of unchanged HTML
+    raw_hash = scraper._compute_raw_hash("Title", "<p>Body</p>")
+    monkeypatch.setattr("scraper.CONVERTER_VERSION", "test")
+    assert scraper._compute_raw_hash("Title", "<p>Body</p>") != raw_hash
+
+
+def test_legacy_sha256_hash_kept_until_content_changes(temp_data_dir):
+    """Test that SHA256 index entries are not rehashed while content is unchanged."""
+    scraper = ArticleScraper(data_dir=str(temp_data_dir))
+    item = {"id": 1, "updated_at": "2024-01-01T00:00:00Z", "title": "Title", "body": "<p>Body</p>"}
+    slug, metadata = scraper._scrape_article(item, use_api=True)
+    assert metadata["hash_algo"] == "blake3"
+    
+    # Pretend the entry was written before the switch to BLAKE3
+    markdown = (temp_data_dir / "articles" / f"{slug}.md").read_text(encoding="utf-8")
+    legacy_hash = hashlib.sha256(scraper._normalize_markdown(markdown).encode("utf-8")).hexdigest()
+    scraper.index = {slug: {"hash": legacy_hash, "last_modified": "2023-01-01T00:00:00Z"}}
+    
+    item["updated_at"] = "2024-02-01T00:00:00Z"
+    _, metadata = scraper._scrape_article(item, use_api=True)
+    assert metadata["hash"] == legacy_hash
+    assert metadata["hash_algo"] == "sha256"
+    
+    # Changed content moves the entry to BLAKE3
+    item["body"] = "<p>New body</p>"
+    _, metadata = scraper._scrape_article(item, use_api=True)
+    assert metadata["hash"] != legacy_hash
+    assert metadata["hash_algo"] == "blake3"
+
+
+def test_api_listing_stops_at_unchanged_article(temp_data_dir, monkeypatch):
+    """Test that article listing stops once it reaches an unchanged article."""
+    monkeypatch.setattr("scraper.RATE_LIMIT_DELAY", 0)
+    index = {
+        "article-2": {"last_modified": "2024-01-02T00:00:00Z", "hash": "abc"},
+        "article-1": {"last_modified": "2024-01-01T00:00:00Z", "hash": "def"},
+    }
+    (temp_data_dir / "index.json").write_text(json.dumps(index), encoding="utf-8")
+    scraper = ArticleScraper(data_dir=str(temp_data_dir))
+    scraper.index_store.set_complete(True)
+    
+    page = {
+        "articles": [
+            {"id": 3, "updated_at": "2024-01-03T00:00:00Z"},
+            {"id": 2, "updated_at": "2024-01-02T00:00:00Z"},
+            {"id": 1, "updated_at": "2024-01-01T00:00:00Z"},
+        ],
+        "meta": {"has_more": True},
+        "links": {"next": "https://example.com/next"},
+    }
+    
+    class FakeResponse:
+        status_code = 200
+        
+        def json(self):
+            return page
+    
+    requested = []
+    
+    def fake_get(url, **kwargs):
+        requested.append(url)
+        return FakeResponse()
+    
+    monkeypatch.setattr(scraper.session, "get", fake_get)
+    articles = scraper._get_article_list_api()
+    
+    # Only the article newer than the index is listed, and no further pages are fetched
+    assert [article["id"] for article in articles] == [3]
+    assert len(requested) == 1
+    assert scraper.api_listing_truncated
+    assert set(scraper._get_unlisted_articles(articles)) == {"article-1", "article-2"}
+
+
+def test_api_listing_reads_everything_unless_index_is_complete(temp_data_dir, monkeypatch):
+    """Test that a partial index or a missing updated_at never ends the listing early."""
+    monkeypatch.setattr("scraper.RATE_LIMIT_DELAY", 0)
+    monkeypatch.delenv("ARTICLE_LIMIT", raising=False)
+    index = {"article-2": {"last_modified": "2024-01-02T00:00:00Z", "hash": "abc"}}
+    (temp_data_dir / "index.json").write_text(json.dumps(index), encoding="utf-8")
+    scraper = ArticleScraper(data_dir=str(temp_data_dir))
+    
+    page = {
+        "articles": [
+            {"id": 3},
+            {"id": 2, "updated_at": "2024-01-02T00:00:00Z"},
+            {"id": 1, "updated_at": "2024-01-01T00:00:00Z"},
+        ],
+        "meta": {"has_more": False},
+    }
+    
+    class FakeResponse:
+        status_code = 200
+        
+        def json(self):
+            return page
+    
+    monkeypatch.setattr(scraper.session, "get", lambda url, **kwargs: FakeResponse())
+    
+    # The index may come from a limited or failed run, so older articles can be missing
+    assert [article["id"] for article in scraper._get_article_list_api()] == [3, 2, 1]
+    assert not scraper.api_listing_truncated
+    assert scraper.api_listing_complete
+    
+    # A complete index still never stops at an article without updated_at
+    scraper.index_store.set_complete(True)
+    scraper.index = {"article-3": {"hash": "abc"}, **index}
+    assert [article["id"] for article in scraper._get_article_list_api()] == [3]
+    assert scraper.api_listing_truncated
+    
+    # An article limit also disables the early exit
+    scraper.article_limit = 30
+    assert [article["id"] for article in scraper._get_article_list_api()] == [3, 2, 1]
+
+
+def test_unchanged_api_article_is_not_refetched(temp_data_dir, monkeypatch):
+    """Test that articles with an unchanged updated_at reuse index metadata."""
+    index = {"article-1": {"last_modified": "2024-01-01T00:00:00Z", "hash": "abc"}}
+    (temp_data_dir / "index.json").write_text(json.dumps(index), encoding="utf-8")
+    (temp_data_dir / "articles" / "article-1.md").write_text("# Old", encoding="utf-8")
+    scraper = ArticleScraper(data_dir=str(temp_data_dir))
+    
+    def fail_get(url, **kwargs):
+        raise AssertionError(f"unexpected request: {url}")
+    
+    monkeypatch.setattr(scraper.session, "get", fail_get)
+    
+    # Unchanged: index metadata reused without any request
+    item = {"id": 1, "updated_at": "2024-01-01T00:00:00Z"}
+    assert scraper._scrape_article(item, use_api=True) == ("article-1", index["article-1"])
+    
+    # Changed: converted from the listed body, still without a request
+    item = {"id": 1, "updated_at": "2024-02-01T00:00:00Z", "title": "New", "body": "<p>New body</p>"}
+    slug, metadata = scraper._scrape_article(item, use_api=True)
+    assert slug == "article-1"
+    assert metadata["hash"] != "abc"
+    assert metadata["last_modified"] == "2024-02-01T00:00:00Z"
+    assert "New body" in (temp_data_dir / "articles" / "article-1.md").read_text(encoding="utf-8")
+
+
+def test_index_store_log_replay_and_compaction(temp_data_dir):
+    """Test that index changes are logged, replayed, and compacted."""
+    index_file = temp_data_dir / "index.json"
+    snapshot = {f"article-{i}": {"hash": str(i)} for i in range(10)}
+    index_file.write_text(json.dumps(snapshot), encoding="utf-8")
+    
+    store = IndexStore(index_file)
+    store.load()
+    store.update({"article-0": {"hash": "changed"}, "article-1": {"hash": "1"}})
+    
+    # Only the changed entry is appended; the snapshot is untouched
+    assert store.log_file.read_text(encoding="utf-8").count("\n") == 1
+    assert json.loads(index_file.read_text(encoding="utf-8")) == snapshot
+    assert IndexStore(index_file).load()["article-0"] == {"hash": "changed"}
+    
+    # Exceeding the compaction threshold folds the log into the snapshot
+    store.update({"article-10": {"hash": "10"}, "article-11": {"hash": "11"}})
+    assert not store.log_file.exists()
+    compacted = json.loads(index_file.read_text(encoding="utf-8"))
+    assert len(compacted) == 12
+    assert compacted["article-0"] == {"hash": "changed"}
 
 
 def test_chunking_strategy(monkeypatch):
@@ -164,6 +338,132 @@ def test_chunking_with_headings(monkeypatch):
     assert any("First Section" in h or "First" in h for h in headings) or len(chunks) == 1
 
 
+def test_chunk_overlap_is_trimmed_on_tokens(monkeypatch):
+    """Test that trimmed overlaps stay within OVERLAP_TOKENS and chunk sizes stay accurate."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    uploader = ArticleUploader()
+    encode = uploader.encoding.encode
+    
+    # Two pieces well over OVERLAP_TOKENS together must be trimmed
+    pieces = ["First piece, with some words in it. " * 15, "Second piece ends here. " * 15]
+    overlap_text, overlap_ids = uploader._build_overlap(pieces, [encode(p) for p in pieces])
+    assert 0 < len(encode(overlap_text)) <= OVERLAP_TOKENS
+    assert overlap_ids == encode(overlap_text)
+    assert pieces[1].strip().endswith(overlap_text.split()[-1])
+    
+    long_para = "Paragraph text that keeps going for a while, sentence after sentence. " * 12
+    big_para = "A sentence inside an oversized paragraph. " * 150
+    markdown = "## Section\n\n" + "\n\n".join([long_para] * 6) + "\n\n" + big_para
+    chunks = uploader._create_chunks(markdown, "test", "https://example.com")
+    assert len(chunks) > 2
+    
+    for chunk in chunks:
+        # Running counts may be off by one per "\n\n" join
+        assert abs(chunk["tokens"] - len(encode(chunk["text"]))) <= chunk["text"].count("\n\n")
+
+
+def test_upload_attaches_files_in_batches(monkeypatch):
+    """Test that chunk files are attached per FILE_BATCH_SIZE and failed batches are not counted."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr("uploader.FILE_BATCH_SIZE", 3)
+    uploader = ArticleUploader()
+    monkeypatch.setattr(uploader, "_get_or_create_vector_store", lambda: "vs_test")
+    
+    class FakeFile:
+        def __init__(self, file_id):
+            self.id = file_id
+    
+    def fake_create(file, purpose):
+        return FakeFile(f"file-{file[0]}")
+    
+    deleted = []
+    monkeypatch.setattr(uploader.client.files, "create", fake_create)
+    monkeypatch.setattr(uploader.client.files, "delete", deleted.append)
+    
+    class FakeResponse:
+        def __init__(self, status_code):
+            self.status_code = status_code
+            self.text = ""
+    
+    posts = []
+    
+    def fake_post(url, json=None, **kwargs):
+        posts.append((url, json["file_ids"]))
+        # Reject the second batch
+        return FakeResponse(500 if len(posts) == 2 else 200)
+    
+    monkeypatch.setattr(uploader._http, "post", fake_post)
+    
+    chunks = [
+        {"text": "chunk", "chunk_index": i, "article_slug": slug}
+        for slug, count in [("a", 4), ("b", 3)]
+        for i in range(count)
+    ]
+    queued = uploader._upload_chunks(chunks)
+    
+    # 7 chunks in batches of 3: [a a a] [a b b] [b]
+    assert [len(file_ids) for _, file_ids in posts] == [3, 3, 1]
+    assert all(url.endswith("/vector_stores/vs_test/file_batches") for url, _ in posts)
+    assert queued == {"a": 3, "b": 1}
+    assert deleted == posts[1][1]
+
+
+def test_chunk_cache_skips_rechunking(tmp_path, monkeypatch):
+    """Test that unchanged articles are served from the chunk cache."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    uploader = ArticleUploader(chunk_cache_dir=str(tmp_path / "cache"))
+    
+    md_file = tmp_path / "article.md"
+    md_file.write_text("## Section\n" + "Some cached content. " * 50, encoding="utf-8")
+    metadata = {"source_url": "https://example.com/article"}
+    
+    chunks = uploader._chunk_article("article", md_file, metadata)
+    assert chunks
+    
+    # A second read of the same content must not re-chunk
+    def fail(*args, **kwargs):
+        raise AssertionError("article was re-chunked")
+    monkeypatch.setattr(uploader, "_create_chunks", fail)
+    assert uploader._chunk_article("article", md_file, metadata) == chunks
+    
+    # Changed content misses the cache
+    md_file.write_text("## Section\n" + "Changed content. " * 50, encoding="utf-8")
+    with pytest.raises(AssertionError):
+        uploader._chunk_article("article", md_file, metadata)
+    
+    # Re-chunking replaces the article's superseded entry
+    ArticleUploader(chunk_cache_dir=str(tmp_path / "cache"))._chunk_article("article", md_file, metadata)
+    assert len(list((tmp_path / "cache" / "article").glob("*.json"))) == 1
+
+
+def test_upload_articles_batches_tokenization_across_articles(tmp_path, monkeypatch):
+    """Test that one batched tokenize over all articles chunks each article as alone."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr("uploader.TOKENIZER_THREADS", 4)
+    uploader = ArticleUploader(chunk_cache_dir=str(tmp_path / "cache"))
+    
+    articles = {}
+    for i in range(3):
+        paragraphs = [f"Article {i} paragraph {j} has words to count. " * 20 for j in range(4)]
+        (tmp_path / f"article-{i}.md").write_text("## Section\n\n" + "\n\n".join(paragraphs), encoding="utf-8")
+        articles[f"article-{i}"] = {"source_url": f"https://example.com/{i}"}
+    
+    batches = []
+    encode_batch = uploader._encode_batch
+    monkeypatch.setattr(uploader, "_encode_batch", lambda texts: batches.append(texts) or encode_batch(texts))
+    uploaded = []
+    monkeypatch.setattr(uploader, "_upload_chunks", lambda chunks: uploaded.extend(chunks) or {})
+    uploader.upload_articles(articles, tmp_path)
+    
+    # Each article contributes its heading line and four paragraphs
+    assert len(batches) == 1 and len(batches[0]) == 15
+    expected = []
+    for slug, metadata in articles.items():
+        markdown = (tmp_path / f"{slug}.md").read_text(encoding="utf-8")
+        expected.extend(uploader._create_chunks(markdown, slug, metadata["source_url"]))
+    assert uploaded == expected
+
+
 def test_normalize_markdown():
     """Test markdown normalization."""
     scraper = ArticleScraper(data_dir="temp_test")
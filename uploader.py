@@ -2,15 +2,20 @@
 Chunking and vector store upload for articles.
 """
 
-import io
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import tiktoken
+from blake3 import blake3
 from openai import OpenAI
 import requests
+from requests.adapters import HTTPAdapter
+
+from _json_io import dump_json, load_json
 
 # Chunking parameters
 TARGET_TOKENS = 600  # Target tokens per chunk (400-700 range)
@@ -18,57 +23,120 @@ OVERLAP_TOKENS = 100  # Overlap between chunks
 MIN_CHUNK_TOKENS = 200  # Minimum chunk size
 MAX_CHUNK_TOKENS = 800  # Maximum chunk size
 
+# Bump whenever chunking output changes, so cached chunks are recomputed
+CHUNKER_VERSION = "4"
+
+# Chunk uploads in flight at once (kept well under OpenAI rate limits)
+UPLOAD_CONCURRENCY = 16
+
+# Most file IDs the vector store accepts in one file batch
+FILE_BATCH_SIZE = 500
+
+# HTTP connection pool size for vector store REST calls
+HTTP_POOL_SIZE = 32
+
+# Threads reading markdown files ahead of chunking
+READ_WORKERS = 8
+
+# Threads for batched tokenization; with one core a batch is encoded inline
+TOKENIZER_THREADS = os.cpu_count() or 1
+
 # Embedding model
 EMBEDDING_MODEL = "text-embedding-3-small"
 
+# Model whose tokenizer is used for chunk sizing
+TOKENIZER_MODEL = "gpt-4"
+
+# Patterns for splitting markdown into sections, paragraphs and sentences
+_HEADING_RE = re.compile(r"^(##|###)[ \t]+(.+)$", re.M)
+_PARA_SPLIT_RE = re.compile(r"\n\s*\n")
+_SENT_RE = re.compile(r"[.!?]+\s+")
+
+
+@lru_cache(maxsize=4)
+def _get_encoding(model: str) -> tiktoken.Encoding:
+    """Get the tiktoken encoding for a model, loading its BPE ranks only once."""
+    return tiktoken.encoding_for_model(model)
+
+
+# Optionally pay the encoding load at import time rather than on first use
+if os.getenv("KB_PRELOAD_TIKTOKEN"):
+    _get_encoding(TOKENIZER_MODEL)
+
 
 class ArticleUploader:
-    def __init__(self, api_key: Optional[str] = None, vector_store_id: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        vector_store_id: Optional[str] = None,
+        chunk_cache_dir: str = "data/chunk_cache"
+    ):
         self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
         self.vector_store_id = vector_store_id
-        self.encoding = tiktoken.encoding_for_model("gpt-4")
+        # Vector store already confirmed to exist, so it is checked only once
+        self._verified_vector_store_id = None
+        self._chunk_cache_path = Path(chunk_cache_dir)
+        self.encoding = _get_encoding(TOKENIZER_MODEL)
+        # Token IDs of the "\n\n" between joined chunk pieces
+        self._join_ids = self.encoding.encode("\n\n")
+        self._join_tokens = len(self._join_ids)
+        
+        # Pooled session for vector store REST calls, so connections are reused
+        self._http = requests.Session()
+        self._http.mount("https://", HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+        self._base_url = str(self.client.base_url or "https://api.openai.com/v1").rstrip("/")
+        self._headers = {
+            "Authorization": f"Bearer {self.client.api_key or os.getenv('OPENAI_API_KEY')}",
+            "Content-Type": "application/json",
+            "OpenAI-Beta": "assistants=v2"
+        }
         
     def _count_tokens(self, text: str) -> int:
         """Count tokens in text."""
         return len(self.encoding.encode(text))
     
-    def _split_by_heading(self, markdown: str) -> List[Dict[str, str]]:
-        """Split markdown into sections by H2/H3 headings."""
-        sections = []
-        current_section = {"heading": "", "content": ""}
+    def _encode_all(self, texts: List[str]) -> List[List[int]]:
+        """Tokenize many texts, keeping the token IDs."""
+        return [self.encoding.encode(text) for text in texts]
+    
+    def _encode_batch(self, texts: List[str]) -> List[List[int]]:
+        """
+        Tokenize a large batch of texts across TOKENIZER_THREADS threads.
         
-        lines = markdown.split("\n")
+        tiktoken's encode_batch maps encode over a thread pool, which releases
+        the GIL but adds a pool per call and a future per text. Call it once
+        per run rather than per article, and not at all on a single core,
+        where the futures only add overhead.
+        """
+        if TOKENIZER_THREADS > 1:
+            return self.encoding.encode_batch(texts, num_threads=TOKENIZER_THREADS)
+        return self._encode_all(texts)
+    
+    def _iter_paragraphs_with_headings(self, markdown: str) -> Iterator[Tuple[str, int, List[str]]]:
+        """
+        Split markdown into H2/H3 sections and their paragraphs in one pass.
         
-        for line in lines:
-            # Check if line is a heading (H2 or H3)
-            heading_match = re.match(r"^(##|###)\s+(.+)$", line)
+        Yields:
+            (heading, heading_level, paragraphs) for each section with content;
+            text before the first heading has an empty heading and level 0
+        """
+        heading, level, start = "", 0, 0
+        for match in _HEADING_RE.finditer(markdown):
+            paragraphs = self._split_into_paragraphs(markdown[start:match.start()])
+            if paragraphs:
+                yield heading, level, paragraphs
             
-            if heading_match:
-                # Save previous section if it has content
-                if current_section["content"].strip():
-                    sections.append(current_section)
-                
-                # Start new section
-                level = len(heading_match.group(1))
-                heading_text = heading_match.group(2).strip()
-                current_section = {
-                    "heading": heading_text,
-                    "heading_level": level,
-                    "content": line + "\n"
-                }
-            else:
-                current_section["content"] += line + "\n"
-        
-        # Add last section
-        if current_section["content"].strip():
-            sections.append(current_section)
-        
-        return sections
+            # The heading line stays at the top of its own section
+            heading, level, start = match.group(2).strip(), len(match.group(1)), match.start()
+        
+        paragraphs = self._split_into_paragraphs(markdown[start:])
+        if paragraphs:
+            yield heading, level, paragraphs
     
     def _split_into_paragraphs(self, text: str) -> List[str]:
         """Split text into paragraphs."""
         # Split by double newlines
-        paragraphs = re.split(r"\n\s*\n", text)
+        paragraphs = _PARA_SPLIT_RE.split(text)
         return [p.strip() for p in paragraphs if p.strip()]
     
     def _create_chunks(self, markdown: str, article_slug: str, source_url: str) -> List[Dict]:
@@ -81,28 +149,38 @@ class ArticleUploader:
         3. Combine paragraphs to target token size
         4. Add overlap between chunks
         """
+        # Split into sections and paragraphs, then tokenize every paragraph once
+        sections = list(self._iter_paragraphs_with_headings(markdown))
+        paragraph_ids = self._encode_all(self._section_paragraphs(sections))
+        return self._pack_chunks(sections, iter(paragraph_ids), article_slug, source_url)
+    
+    def _section_paragraphs(self, sections: List[Tuple[str, int, List[str]]]) -> List[str]:
+        """Flatten sections into their paragraphs, in order."""
+        return [para for _, _, paragraphs in sections for para in paragraphs]
+    
+    def _pack_chunks(
+        self,
+        sections: List[Tuple[str, int, List[str]]],
+        paragraph_ids: Iterator[List[int]],
+        article_slug: str,
+        source_url: str
+    ) -> List[Dict]:
+        """Pack tokenized section paragraphs into chunks, consuming one ID list per paragraph."""
         chunks = []
         
-        # Split by headings first
-        sections = self._split_by_heading(markdown)
-        
-        # If no headings, treat entire content as one section
-        if not sections:
-            sections = [{"heading": "", "content": markdown}]
-        
-        for section_idx, section in enumerate(sections):
-            heading = section.get("heading", "")
-            content = section["content"]
-            
-            # Split section into paragraphs
-            paragraphs = self._split_into_paragraphs(content)
-            
+        # Packing is one linear pass over cached token counts; it costs far less
+        # than splitting or tokenizing, so it stays a plain loop. The running
+        # counts are reported as each chunk's size; they can be a token off per
+        # piece join, where BPE merges across "\n\n", which the budgets absorb.
+        for heading, _, paragraphs in sections:
             current_chunk = []
+            current_ids = []  # Token IDs of the pieces in current_chunk
             current_tokens = 0
             chunk_index = 0
             
             for para in paragraphs:
-                para_tokens = self._count_tokens(para)
+                para_ids = next(paragraph_ids)
+                para_tokens = len(para_ids)
                 
                 # If paragraph itself is too large, split it
                 if para_tokens > MAX_CHUNK_TOKENS:
@@ -119,12 +197,13 @@ class ArticleUploader:
                         })
                         chunk_index += 1
                         current_chunk = []
+                        current_ids = []
                         current_tokens = 0
                     
                     # Split large paragraph into sentences
-                    sentences = re.split(r'[.!?]+\s+', para)
-                    for sent in sentences:
-                        sent_tokens = self._count_tokens(sent)
+                    sentences = _SENT_RE.split(para)
+                    for sent, sent_ids in zip(sentences, self._encode_all(sentences)):
+                        sent_tokens = len(sent_ids)
                         if current_tokens + sent_tokens > TARGET_TOKENS and current_chunk:
                             chunk_text = "\n\n".join(current_chunk)
                             chunks.append({
@@ -138,19 +217,14 @@ class ArticleUploader:
                             chunk_index += 1
                             
                             # Start new chunk with overlap
-                            overlap_text = "\n\n".join(current_chunk[-2:]) if len(current_chunk) >= 2 else current_chunk[-1] if current_chunk else ""
-                            overlap_tokens = self._count_tokens(overlap_text)
-                            if overlap_tokens > OVERLAP_TOKENS:
-                                # Trim overlap to target size
-                                overlap_words = overlap_text.split()
-                                target_words = int(OVERLAP_TOKENS * len(overlap_words) / overlap_tokens)
-                                overlap_text = " ".join(overlap_words[-target_words:])
-                            
-                            current_chunk = [overlap_text, sent] if overlap_text else [sent]
-                            current_tokens = self._count_tokens("\n\n".join(current_chunk))
+                            overlap_text, overlap_ids = self._build_overlap(current_chunk[-2:], current_ids[-2:])
+                            current_chunk, current_ids, current_tokens = self._start_chunk(
+                                overlap_text, overlap_ids, sent, sent_ids
+                            )
                         else:
+                            current_tokens += sent_tokens + (self._join_tokens if current_chunk else 0)
                             current_chunk.append(sent)
-                            current_tokens += sent_tokens
+                            current_ids.append(sent_ids)
                 
                 # Check if adding this paragraph would exceed target
                 elif current_tokens + para_tokens > TARGET_TOKENS and current_chunk:
@@ -168,19 +242,15 @@ class ArticleUploader:
                         chunk_index += 1
                     
                     # Start new chunk with overlap
-                    overlap_text = "\n\n".join(current_chunk[-1:]) if current_chunk else ""
-                    overlap_tokens = self._count_tokens(overlap_text)
-                    if overlap_tokens > OVERLAP_TOKENS:
-                        overlap_words = overlap_text.split()
-                        target_words = int(OVERLAP_TOKENS * len(overlap_words) / overlap_tokens)
-                        overlap_text = " ".join(overlap_words[-target_words:])
-                    
-                    current_chunk = [overlap_text, para] if overlap_text else [para]
-                    current_tokens = self._count_tokens("\n\n".join(current_chunk))
+                    overlap_text, overlap_ids = self._build_overlap(current_chunk[-1:], current_ids[-1:])
+                    current_chunk, current_ids, current_tokens = self._start_chunk(
+                        overlap_text, overlap_ids, para, para_ids
+                    )
                 else:
                     # Add to current chunk
+                    current_tokens += para_tokens + (self._join_tokens if current_chunk else 0)
                     current_chunk.append(para)
-                    current_tokens += para_tokens
+                    current_ids.append(para_ids)
             
             # Save remaining chunk
             if current_chunk and current_tokens >= MIN_CHUNK_TOKENS:
@@ -196,34 +266,72 @@ class ArticleUploader:
         
         return chunks
     
+    def _build_overlap(self, pieces: List[str], piece_ids: List[List[int]]) -> Tuple[str, List[int]]:
+        """
+        Build the overlap carried from the tail of a finished chunk.
+        
+        Trimming keeps the last OVERLAP_TOKENS of the pieces' cached token IDs,
+        so the overlap never exceeds OVERLAP_TOKENS.
+        
+        Returns:
+            (overlap_text, overlap_ids)
+        """
+        if not pieces:
+            return "", []
+        
+        overlap_ids = list(piece_ids[0])
+        for ids in piece_ids[1:]:
+            overlap_ids.extend(self._join_ids)
+            overlap_ids.extend(ids)
+        
+        if len(overlap_ids) <= OVERLAP_TOKENS:
+            return "\n\n".join(pieces), overlap_ids
+        
+        # Keep the last OVERLAP_TOKENS tokens; a multi-byte character cut at
+        # the start decodes to replacement characters, which are dropped along
+        # with leading whitespace, so the trimmed text is re-encoded (at most
+        # OVERLAP_TOKENS tokens) to keep its IDs in step with it
+        overlap_text = self.encoding.decode(overlap_ids[-OVERLAP_TOKENS:]).lstrip("\ufffd").lstrip()
+        return overlap_text, self.encoding.encode(overlap_text)
+    
+    def _start_chunk(self, overlap_text: str, overlap_ids: List[int], piece: str, piece_ids: List[int]) -> Tuple[List[str], List[List[int]], int]:
+        """
+        Start a new chunk from an overlap and its first piece.
+        
+        Returns:
+            (pieces, piece_token_ids, total_tokens)
+        """
+        if not overlap_text:
+            return [piece], [piece_ids], len(piece_ids)
+        return (
+            [overlap_text, piece],
+            [overlap_ids, piece_ids],
+            len(overlap_ids) + self._join_tokens + len(piece_ids),
+        )
+    
     def _get_or_create_vector_store(self) -> str:
         """Get existing vector store ID or create a new one."""
-        api_key = self.client.api_key or os.getenv("OPENAI_API_KEY")
-        base_url = self.client.base_url or "https://api.openai.com/v1"
-        
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-            "OpenAI-Beta": "assistants=v2"
-        }
+        if self.vector_store_id and self.vector_store_id == self._verified_vector_store_id:
+            return self.vector_store_id
         
         if self.vector_store_id:
             # Verify it exists
             try:
-                response = requests.get(
-                    f"{base_url}/vector_stores/{self.vector_store_id}",
-                    headers=headers,
+                response = self._http.get(
+                    f"{self._base_url}/vector_stores/{self.vector_store_id}",
+                    headers=self._headers,
                     timeout=10
                 )
                 if response.status_code == 200:
+                    self._verified_vector_store_id = self.vector_store_id
                     return self.vector_store_id
             except Exception:
                 pass
         
         # Create new vector store using REST API
-        response = requests.post(
-            f"{base_url}/vector_stores",
-            headers=headers,
+        response = self._http.post(
+            f"{self._base_url}/vector_stores",
+            headers=self._headers,
             json={"name": "OptiSigns Knowledge Base"},
             timeout=10
         )
@@ -234,98 +342,232 @@ class ArticleUploader:
             )
         
         vector_store = response.json()
+        self._verified_vector_store_id = vector_store["id"]
         return vector_store["id"]
     
-    def upload_article(self, article_slug: str, markdown_path: Path, metadata: Dict) -> int:
+    def _create_chunk_file(self, article_slug: str, chunk: Dict) -> Optional[str]:
         """
-        Upload a single article to vector store.
+        Upload one chunk as a file.
+        
+        Runs inside a worker thread.
         
         Returns:
-            Number of chunks uploaded
+            The new file ID, or None if the upload failed
         """
-        # Read markdown file
-        with open(markdown_path, "r", encoding="utf-8") as f:
-            markdown_content = f.read()
-        
-        # Create chunks
-        chunks = self._create_chunks(
-            markdown_content,
-            article_slug,
-            metadata.get("source_url", "")
-        )
+        try:
+            # Pass the encoded text straight through as (name, content, type)
+            file_name = f"{article_slug}_chunk_{chunk['chunk_index']}.md"
+            file_response = self.client.files.create(
+                file=(file_name, chunk["text"].encode("utf-8"), "text/markdown"),
+                purpose="assistants"
+            )
+            return file_response.id
+        except Exception as e:
+            print(f"Error uploading chunk {chunk['chunk_index']} of {article_slug}: {e}")
+            return None
+    
+    def _attach_files(self, vector_store_id: str, file_ids: List[str]) -> bool:
+        """
+        Add a batch of files to the vector store in one request.
+        
+        The batch is queued for processing; indexing finishes server-side.
         
+        Returns:
+            True if the batch was accepted
+        """
+        try:
+            response = self._http.post(
+                f"{self._base_url}/vector_stores/{vector_store_id}/file_batches",
+                headers=self._headers,
+                json={"file_ids": file_ids},
+                timeout=30
+            )
+            
+            if response.status_code not in [200, 201]:
+                raise Exception(
+                    f"Failed to add file batch to vector store: {response.status_code} - {response.text}"
+                )
+            
+            return True
+        except Exception as e:
+            print(f"Error adding {len(file_ids)} files to vector store: {e}")
+            return False
+    
+    def _delete_files(self, file_ids: List[str]):
+        """Delete uploaded files that never made it into the vector store."""
+        for file_id in file_ids:
+            try:
+                self.client.files.delete(file_id)
+            except Exception as e:
+                print(f"Warning: could not delete orphaned file {file_id}: {e}")
+    
+    def _chunk_cache_file(self, markdown: bytes, article_slug: str, source_url: str) -> Path:
+        """Get the chunk cache file for this exact article content and chunker version."""
+        hasher = blake3("\0".join([CHUNKER_VERSION, article_slug, source_url, ""]).encode("utf-8"))
+        hasher.update(markdown)
+        return self._chunk_cache_path / article_slug / f"{hasher.hexdigest()}.json"
+    
+    def _chunk_article(self, article_slug: str, markdown_path: Path, metadata: Dict) -> List[Dict]:
+        """Read an article's markdown file and split it into chunks."""
+        return self._chunk_markdown(article_slug, Path(markdown_path).read_bytes(), metadata)
+    
+    def _chunk_markdown(self, article_slug: str, markdown: bytes, metadata: Dict) -> List[Dict]:
+        """
+        Split an article's UTF-8 markdown into chunks.
+        
+        Chunking is deterministic, so results are cached by content and
+        unchanged articles are not re-chunked on later runs. The cache key is
+        hashed from the file bytes as read, so a cache hit never decodes them.
+        Each article keeps only its latest entry.
+        """
+        source_url = metadata.get("source_url", "")
+        
+        cache_file = self._chunk_cache_file(markdown, article_slug, source_url)
+        chunks = self._load_cached_chunks(cache_file)
+        if chunks is None:
+            chunks = self._create_chunks(self._decode_markdown(markdown), article_slug, source_url)
+            self._save_cached_chunks(cache_file, chunks)
+        
+        return chunks
+    
+    def _decode_markdown(self, markdown: bytes) -> str:
+        """Decode markdown file bytes, translating newlines as text-mode reads do."""
+        markdown_content = markdown.decode("utf-8")
+        if "\r" in markdown_content:
+            markdown_content = markdown_content.replace("\r\n", "\n").replace("\r", "\n")
+        return markdown_content
+    
+    def _load_cached_chunks(self, cache_file: Path) -> Optional[List[Dict]]:
+        """Load cached chunks, or None on a miss."""
+        if cache_file.exists():
+            try:
+                return load_json(cache_file)
+            except (OSError, ValueError) as e:
+                print(f"Warning: ignoring unreadable chunk cache {cache_file}: {e}")
+        return None
+    
+    def _save_cached_chunks(self, cache_file: Path, chunks: List[Dict]):
+        """Cache an article's chunks, replacing its superseded entries."""
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            dump_json(chunks, cache_file, indent=False)
+            # Entries for earlier content or chunker versions can never hit again
+            for stale_file in cache_file.parent.glob("*.json"):
+                if stale_file != cache_file:
+                    stale_file.unlink()
+        except OSError as e:
+            print(f"Warning: could not write chunk cache {cache_file}: {e}")
+    
+    def _upload_chunks(self, chunks: List[Dict]) -> Dict[str, int]:
+        """
+        Upload chunks from any number of articles through one shared pool.
+        
+        Files are attached FILE_BATCH_SIZE at a time, so one rejected batch
+        drops its chunks for every article in it; their files are deleted
+        rather than left orphaned.
+        
+        Returns:
+            Dict mapping article_slug to number of chunks queued for indexing
+            (the vector store indexes attached files asynchronously)
+        """
+        uploaded = {}
         if not chunks:
-            return 0
+            return uploaded
         
         # Get or create vector store
         vector_store_id = self._get_or_create_vector_store()
         self.vector_store_id = vector_store_id
         
-        # Upload chunks as files
-        uploaded_count = 0
+        # Upload chunks as files, several in flight at once
+        with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as executor:
+            file_ids = list(executor.map(
+                lambda chunk: self._create_chunk_file(chunk["article_slug"], chunk),
+                chunks
+            ))
+        created = [(chunk, file_id) for chunk, file_id in zip(chunks, file_ids) if file_id]
         
-        for chunk in chunks:
-            try:
-                # Create a file-like object from chunk text
-                chunk_text = chunk["text"]
-                chunk_bytes = chunk_text.encode("utf-8")
-                chunk_file = io.BytesIO(chunk_bytes)
-                chunk_file.name = f"{article_slug}_chunk_{chunk['chunk_index']}.md"
-                
-                # Create file
-                file_response = self.client.files.create(
-                    file=chunk_file,
-                    purpose="assistants"
-                )
-                
-                # Add file to vector store using REST API
-                api_key = self.client.api_key or os.getenv("OPENAI_API_KEY")
-                base_url = self.client.base_url or "https://api.openai.com/v1"
-                
-                headers = {
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                    "OpenAI-Beta": "assistants=v2"
-                }
-                
-                response = requests.post(
-                    f"{base_url}/vector_stores/{vector_store_id}/files",
-                    headers=headers,
-                    json={"file_id": file_response.id},
-                    timeout=10
-                )
-                
-                if response.status_code not in [200, 201]:
-                    raise Exception(
-                        f"Failed to add file to vector store: {response.status_code} - {response.text}"
-                    )
-                
-                uploaded_count += 1
-            except Exception as e:
-                print(f"Error uploading chunk {chunk['chunk_index']} of {article_slug}: {e}")
+        # Attach the files in as few batch requests as possible
+        for start in range(0, len(created), FILE_BATCH_SIZE):
+            batch = created[start:start + FILE_BATCH_SIZE]
+            batch_file_ids = [file_id for _, file_id in batch]
+            if not self._attach_files(vector_store_id, batch_file_ids):
+                self._delete_files(batch_file_ids)
+                continue
+            for chunk, _ in batch:
+                slug = chunk["article_slug"]
+                uploaded[slug] = uploaded.get(slug, 0) + 1
+        
+        return uploaded
+    
+    def upload_article(self, article_slug: str, markdown_path: Path, metadata: Dict) -> int:
+        """
+        Upload a single article to vector store.
         
-        return uploaded_count
+        Returns:
+            Number of chunks queued for indexing
+        """
+        chunks = self._chunk_article(article_slug, markdown_path, metadata)
+        return self._upload_chunks(chunks).get(article_slug, 0)
     
     def upload_articles(self, articles_to_upload: Dict[str, Dict], articles_dir: Path) -> Dict[str, int]:
         """
         Upload multiple articles to vector store.
         
+        All articles are chunked first, then every chunk goes through a single
+        upload pool, so small articles don't leave upload slots idle.
+        
+        Chunking stays in-process: the paragraphs of every article missing
+        from the chunk cache are tokenized in one batch, whose threads run
+        outside the GIL, and only the cheap packing pass runs per article.
+        
         Returns:
-            Dict mapping article_slug to number of chunks uploaded
+            Dict mapping article_slug to number of chunks queued for indexing
         """
         chunk_counts = {}
+        article_chunks = {}
+        pending = []  # (slug, source_url, cache_file, sections) of cache misses
         
-        for slug, metadata in articles_to_upload.items():
-            md_file = articles_dir / f"{slug}.md"
-            
-            if not md_file.exists():
-                print(f"Warning: Markdown file not found for {slug}")
-                continue
-            
-            print(f"Uploading {slug}...")
-            chunk_count = self.upload_article(slug, md_file, metadata)
-            chunk_counts[slug] = chunk_count
-            print(f"  Uploaded {chunk_count} chunks")
+        def read_markdown(slug: str) -> Optional[bytes]:
+            try:
+                return (articles_dir / f"{slug}.md").read_bytes()
+            except FileNotFoundError:
+                return None
+        
+        # Phase 1: chunk every article, reading files ahead in the background;
+        # cache misses are only split into sections here
+        with ThreadPoolExecutor(max_workers=READ_WORKERS) as executor:
+            contents = executor.map(read_markdown, articles_to_upload)
+            for (slug, metadata), markdown in zip(articles_to_upload.items(), contents):
+                if markdown is None:
+                    print(f"Warning: Markdown file not found for {slug}")
+                    continue
+                
+                source_url = metadata.get("source_url", "")
+                cache_file = self._chunk_cache_file(markdown, slug, source_url)
+                chunks = self._load_cached_chunks(cache_file)
+                if chunks is None:
+                    sections = list(self._iter_paragraphs_with_headings(self._decode_markdown(markdown)))
+                    pending.append((slug, source_url, cache_file, sections))
+                chunk_counts[slug] = 0
+                article_chunks[slug] = chunks
+        
+        # Tokenize the paragraphs of all cache misses together, then pack each article
+        if pending:
+            paragraph_ids = iter(self._encode_batch(
+                [para for *_, sections in pending for para in self._section_paragraphs(sections)]
+            ))
+            for slug, source_url, cache_file, sections in pending:
+                article_chunks[slug] = self._pack_chunks(sections, paragraph_ids, slug, source_url)
+                self._save_cached_chunks(cache_file, article_chunks[slug])
+        
+        all_chunks = [chunk for chunks in article_chunks.values() for chunk in chunks]
+        
+        # Phase 2: upload all chunks together
+        print(f"Uploading {len(all_chunks)} chunks from {len(chunk_counts)} articles...")
+        uploaded = self._upload_chunks(all_chunks)
+        
+        for slug in chunk_counts:
+            chunk_counts[slug] = uploaded.get(slug, 0)
+            print(f"  {slug}: {chunk_counts[slug]} chunks queued for indexing")
         
         return chunk_counts
-